@@ -1,18 +1,144 @@
 import os
 import re
+import sys
 import configparser
 import requests
 import zipfile
 import tempfile
 import shutil
 import json
+import logging
+import logging.handlers
+import queue
+import hashlib
+import contextvars
+from datetime import datetime, timezone
 from bs4 import BeautifulSoup
 from urllib.parse import quote
 
+logger = logging.getLogger("subtitle_finder")
+summary_logger = logging.getLogger("subtitle_finder.summary")
+
+# Correlation ID and path of the video file currently being processed
+current_file = contextvars.ContextVar("current_file", default=("-", ""))
+
+# Release tags stripped from titles and matched against subtitle releases
+RELEASE_TAGS = (
+    r'(\d{3,4}p|WEBRip|BluRay|WEB-DL|WEBDL|HDRip|DVDRip|'
+    r'x264|x265|H265|H256|HEVC|AAC5\.1|DTS-HD|Atmos|DDP5|Remux|MeGusta|d3g|'
+    r'(?:PPV\.)?[HP]DTV|(?:HD)?CAM|B[LR]\.Rip|WEB|h264|YTS|Copy|10Bit|mkv|mp4|m4v|'
+    r'AC3|DTS|DD5\.1|AC3\.5\.1|AC3\.2\.0|AAC|DTS-HD|TrueHD|BluRay\.Rip|'
+    r'\d{1,2}\.\d{1,2}|\d{1,2}bit|1080p|2160p)'
+)
+SOURCE_TAGS = {'webrip', 'bluray', 'web-dl', 'webdl', 'hdrip', 'dvdrip', 'hdtv',
+               'pdtv', 'ppv.hdtv', 'cam', 'hdcam', 'bl.rip', 'br.rip', 'web',
+               'remux', 'bluray.rip'}
+IGNORED_TAGS = {'mkv', 'mp4', 'm4v', 'copy'}
+# Tags whose last part looks like a "-GROUP" suffix
+HYPHENATED_TAGS = ('web-dl', 'dts-hd')
+
+# How much each kind of matching release token adds to a candidate's score
+TOKEN_WEIGHTS = {'group': 3, 'source': 2, 'resolution': 2, 'other': 1}
+EPISODE_MATCH_BONUS = 10
+
+# Outcomes of downloading one subtitle archive
+DOWNLOAD_OK = 'ok'
+DOWNLOAD_MISS = 'miss'    # Archive opened but held no usable subtitle
+DOWNLOAD_ERROR = 'error'  # Network or file error, worth trying again later
+
+
+class FileContextFilter(logging.Filter):
+    """Attach the current file's correlation ID and path to every record"""
+    def filter(self, record):
+        record.file_id, record.file_path = current_file.get()
+        return True
+
+
+class QuietFilter(logging.Filter):
+    """Only let the summary and errors through to the console"""
+    def filter(self, record):
+        return (record.name == summary_logger.name or
+                record.levelno >= logging.ERROR)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'file_id': getattr(record, 'file_id', '-'),
+            'file': getattr(record, 'file_path', ''),
+            'msg': record.getMessage()
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(config):
+    """Configure logging from the [Logging] section of config.ini
+
+    Records are handed to a queue and written by a background listener
+    thread, so the scanning loop never waits on console or disk I/O.
+    Returns the listener, which must be stopped to flush pending records.
+    """
+    level_name = config.get('Logging', 'level', fallback='INFO').upper()
+    log_file = config.get('Logging', 'log_file', fallback='').strip()
+    log_format = config.get('Logging', 'format', fallback='text').strip().lower()
+    quiet = config.getboolean('Logging', 'quiet', fallback=False)
+
+    # Progress and summary go to stdout, as the old print() output did
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    if quiet:
+        console.addFilter(QuietFilter())
+    handlers = [console]
+
+    file_error = None
+    if log_file:
+        try:
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        except OSError as e:
+            # Reported once the listener is running
+            file_error = e
+        else:
+            if log_format == 'json':
+                file_handler.setFormatter(JsonLinesFormatter())
+            else:
+                file_handler.setFormatter(logging.Formatter(
+                    "%(asctime)s %(levelname)-7s [%(file_id)s] %(message)s"))
+            handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Runs in the calling thread, so the context variable is still visible
+    queue_handler.addFilter(FileContextFilter())
+
+    logger.setLevel(getattr(logging, level_name, logging.INFO))
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    # The summary is always recorded, whatever the configured level
+    summary_logger.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    if file_error:
+        logger.error("Could not open log file %s, logging to console only: %s",
+                     log_file, file_error)
+    return listener
+
+
+def load_config():
+    """Read settings from config.ini"""
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    return config
+
+
 class SubtitleFinder:
-    def __init__(self):
-        self.config = configparser.ConfigParser()
-        self.config.read('config.ini')
+    def __init__(self, config=None):
+        self.config = config if config is not None else load_config()
         self.base_url = "https://subdl.com"
         self.session = requests.Session()
         self.user_agents = [
@@ -31,6 +157,10 @@ class SubtitleFinder:
         
         # Load show name mappings from file
         self.show_name_mappings = self.load_show_name_mappings()
+        
+        # Subtitle archives already tried (and failed) for each video file
+        self.tried_subtitles = self.load_tried_subtitles()
+        self.max_candidates = self.config.getint('Settings', 'max_candidates', fallback=3)
 
     def load_show_name_mappings(self):
         """Load show name mappings from file"""
@@ -40,7 +170,7 @@ class SubtitleFinder:
                 with open(mappings_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                print(f"Error loading show name mappings: {e}")
+                logger.error("Error loading show name mappings: %s", e)
                 return {}
         return {}
 
@@ -50,9 +180,31 @@ class SubtitleFinder:
         try:
             with open(mappings_file, 'w', encoding='utf-8') as f:
                 json.dump(self.show_name_mappings, f, indent=2, ensure_ascii=False)
-            print(f"Saved {len(self.show_name_mappings)} show name mappings to {mappings_file}")
+            logger.info("Saved %d show name mappings to %s", len(self.show_name_mappings), mappings_file)
+        except Exception as e:
+            logger.error("Error saving show name mappings: %s", e)
+
+    def load_tried_subtitles(self):
+        """Load the record of subtitle archives already tried per video file"""
+        tried_file = 'tried_subtitles.json'
+        if os.path.exists(tried_file):
+            try:
+                with open(tried_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error("Error loading tried subtitles: %s", e)
+                return {}
+        return {}
+
+    def save_tried_subtitles(self):
+        """Save the record of subtitle archives already tried per video file"""
+        tried_file = 'tried_subtitles.json'
+        try:
+            with open(tried_file, 'w', encoding='utf-8') as f:
+                json.dump(self.tried_subtitles, f, indent=2, ensure_ascii=False)
+            logger.debug("Saved tried subtitles for %d files to %s", len(self.tried_subtitles), tried_file)
         except Exception as e:
-            print(f"Error saving show name mappings: {e}")
+            logger.error("Error saving tried subtitles: %s", e)
 
     def get_official_show_name(self, show_title):
         """Get the official show name from TVmaze API"""
@@ -66,7 +218,7 @@ class SubtitleFinder:
             
             if results and len(results) > 0:
                 show = results[0]['show']
-                print(f"TVmaze API: '{show_title}' → '{show['name']}'")
+                logger.info("TVmaze API: '%s' → '%s'", show_title, show['name'])
                 return {
                     'name': show['name'],
                     'original_name': show.get('original_name', show['name']),
@@ -75,7 +227,7 @@ class SubtitleFinder:
                 }
             return None
         except Exception as e:
-            print(f"Error getting official show name: {e}")
+            logger.error("Error getting official show name: %s", e)
             return None
 
     def update_headers(self):
@@ -133,12 +285,14 @@ class SubtitleFinder:
                 'episode_title': episode_title,
                 'season': season,
                 'episode': episode,
-                'title': f"{show_title} S{season}E{episode}"  # Full title for display
+                'title': f"{show_title} S{season}E{episode}",  # Full title for display
+                'release': self._release_tokens(clean_name)
             }
         else:
             # This is a movie - handle normally
             year_match = re.search(r'\b(19|20)\d{2}\b', clean_name)
             year = year_match.group(0) if year_match else None
+            release = self._release_tokens(clean_name)
             
             clean_name = self._clean_common_patterns(clean_name)
             
@@ -146,13 +300,15 @@ class SubtitleFinder:
                 return {
                     'type': 'movie',
                     'title': f"{clean_name}",
-                    'year': year
+                    'year': year,
+                    'release': release
                 }
             else:
                 return {
                     'type': 'movie',
                     'title': clean_name,
-                    'year': None
+                    'year': None,
+                    'release': release
                 }
 
     def _clean_common_patterns(self, text):
@@ -162,11 +318,7 @@ class SubtitleFinder:
             
         # Remove common unwanted patterns
         text = re.sub(
-            r'(?:\.|\(|$$|\-)?(\d{3,4}p|WEBRip|BluRay|WEB-DL|WEBDL|HDRip|DVDRip|'
-            r'x264|x265|H265|H256|HEVC|AAC5\.1|DTS-HD|Atmos|DDP5|Remux|MeGusta|d3g|'
-            r'(?:PPV\.)?[HP]DTV|(?:HD)?CAM|B[LR]\.Rip|WEB|h264|YTS|Copy|10Bit|mkv|mp4|m4v|'
-            r'AC3|DTS|DD5\.1|AC3\.5\.1|AC3\.2\.0|AAC|DTS-HD|TrueHD|BluRay\.Rip|'
-            r'\d{1,2}\.\d{1,2}|\d{1,2}bit|1080p|2160p)(?:\.|\)|$$|\-)?',
+            r'(?:\.|\(|$$|\-)?' + RELEASE_TAGS + r'(?:\.|\)|$$|\-)?',
             '', text, flags=re.IGNORECASE
         )
         
@@ -178,6 +330,96 @@ class SubtitleFinder:
         text = re.sub(r'[\-.]+', ' ', text)
         text = re.sub(r'\s+', ' ', text)
         return text.strip()
+
+    def _release_tokens(self, name):
+        """Extract release group and tags matched by _clean_common_patterns"""
+        tokens = {'group': [], 'source': [], 'resolution': [], 'other': []}
+        
+        name = name.strip()
+        tag_matches = list(re.finditer(r'(?<![A-Za-z0-9])' + RELEASE_TAGS + r'(?![A-Za-z0-9])',
+                                       name, flags=re.IGNORECASE))
+        
+        # Release group is the trailing "-GROUP" of scene-style names, once
+        # any trailing tags like "[rarbg]" are removed. It must follow a
+        # release tag, so titles like "Ant-Man" don't yield a group.
+        stripped = re.sub(r'(?:\s*[\[\(][^\]\)]*[\]\)])+$', '', name)
+        group = None
+        group_match = re.search(r'-([A-Za-z0-9]+)$', stripped)
+        ends_in_tag = any(re.search(r'(?<![a-z0-9])' + tag + '$', stripped.lower())
+                          for tag in HYPHENATED_TAGS)
+        if (group_match and not ends_in_tag and
+                any(match.start() < group_match.start() for match in tag_matches)):
+            group = group_match.group(1).lower()
+            tokens['group'].append(group)
+        
+        for match in tag_matches:
+            tag = match.group(1).lower()
+            if tag in IGNORED_TAGS or tag == group:
+                continue
+            if tag in SOURCE_TAGS:
+                kind = 'source'
+            elif re.fullmatch(r'\d{3,4}p', tag):
+                kind = 'resolution'
+            else:
+                kind = 'other'
+            if tag not in tokens[kind]:
+                tokens[kind].append(tag)
+        return tokens
+
+    def _episode_tags(self, text):
+        """Parse episode tags in text into (season, first, last) tuples
+
+        Season is None for a bare "E05" or "Episode 05", which refers to the
+        season page it is listed on.
+        """
+        tags = []
+        # S01E05, S01xE05, S01x05, chained S01E05E06 and ranges like
+        # S01E01-E03 or S01E01-03; "S01E03-720p" is not a range
+        for m in re.finditer(r'S(\d{1,3})[\s.]*(?:xE|E|x)(\d{1,3})((?:E\d{1,3})*)'
+                             r'(?:\s*-\s*E(\d{1,3})|-(\d{1,3}))?(?![\dp])',
+                             text, flags=re.IGNORECASE):
+            tags.append((int(m.group(1)),) + self._episode_span(m.group(2), *m.group(3, 4, 5)))
+        # 1x05
+        for m in re.finditer(r'(?<![A-Za-z0-9])(\d{1,2})x(\d{2,3})(?!\d)', text):
+            tags.append((int(m.group(1)), int(m.group(2)), int(m.group(2))))
+        # Season 01 Episode 05
+        for m in re.finditer(r'Season[\s.]*(\d{1,3})[\s.]*Episode[\s.]*(\d{1,3})',
+                             text, flags=re.IGNORECASE):
+            tags.append((int(m.group(1)), int(m.group(2)), int(m.group(2))))
+        if not tags:
+            # E05, E05E06, Ep05 / Episode 05
+            for m in re.finditer(r'(?<![A-Za-z0-9])(?:Ep(?:isode)?[\s.]*|E)(\d{1,3})'
+                                 r'((?:E\d{1,3})*)(?!\d)',
+                                 text, flags=re.IGNORECASE):
+                tags.append((None,) + self._episode_span(m.group(1), m.group(2), None, None))
+        return tags
+
+    def _episode_span(self, first, chained, range_end, short_range_end):
+        """First and last episode of a tag, from "E05E06" chains or "-E06" ranges"""
+        episodes = [int(first)] + [int(e) for e in re.findall(r'\d+', chained or '')]
+        last = range_end or short_range_end
+        if last:
+            episodes.append(int(last))
+        return min(episodes), max(episodes)
+
+    def _match_tv_candidate(self, text, season, episode):
+        """Classify release text as 'episode', 'season' (pack) or None (skip)"""
+        season, episode = int(season), int(episode)
+        tags = self._episode_tags(text)
+        if tags:
+            # Archives naming episodes are only kept if one of them is ours
+            for tag_season, first, last in tags:
+                if tag_season in (None, season) and first <= episode <= last:
+                    return 'episode'
+            return None
+        if re.search(r'(?<![A-Za-z0-9])(?:S|Season[\s.]*)0*' + str(season) + r'(?!\d)',
+                     text, flags=re.IGNORECASE):
+            return 'season'
+        return None
+            
+    def file_id(self, file_path):
+        """Short correlation ID for a video file, stable across runs"""
+        return hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:8]
             
     def find_missing_subtitles(self):
         """Find video files missing subtitles"""
@@ -189,7 +431,7 @@ class SubtitleFinder:
         downloaded = 0
         failed = 0
         
-        print(f"\nScanning media folder: {media_path}")
+        logger.info("Scanning media folder: %s", media_path)
         
         for root, _, files in os.walk(media_path):
             for file in files:
@@ -198,8 +440,9 @@ class SubtitleFinder:
                     base_name = os.path.splitext(file)[0]
                     sub_found = False
                     file_path = os.path.join(root, file)
+                    current_file.set((self.file_id(file_path), file_path))
                     
-                    print(f"\nFound video file: {file_path}", flush=True)
+                    logger.info("Found video file: %s", file_path)
                     
                     # Check for existing subtitles
                     for sub_file in files:
@@ -208,18 +451,21 @@ class SubtitleFinder:
                              sub_file.endswith('.english.srt'))):
                             sub_found = True
                             has_subtitles += 1
-                            print(f"Subtitle already exists: {sub_file}", flush=True)
+                            logger.info("Subtitle already exists: %s", sub_file)
+                            # Forget earlier misses for files that are now covered
+                            if self.tried_subtitles.pop(file_path, None) is not None:
+                                self.save_tried_subtitles()
                             break
                     
                     if not sub_found:
-                        print("No matching subtitle found - searching...", flush=True)
+                        logger.info("No matching subtitle found - searching...")
                         cleaned = self.clean_filename(file)
                         # Print cleaned results and search
-                        print(f"  Cleaned title: {cleaned['title']}", flush=True)
+                        logger.info("  Cleaned title: %s", cleaned['title'])
                         if cleaned.get('year'):
-                            print(f"  Detected year: {cleaned['year']}", flush=True)
+                            logger.info("  Detected year: %s", cleaned['year'])
                         if cleaned['type'] == 'tv':
-                            print(f"  Season: {cleaned['season']}, Episode: {cleaned['episode']}", flush=True)
+                            logger.info("  Season: %s, Episode: %s", cleaned['season'], cleaned['episode'])
                         
                         if cleaned['type'] == 'movie':
                             if self.search_movie_subtitles(cleaned, root, file):
@@ -231,7 +477,7 @@ class SubtitleFinder:
                             original_title = cleaned['show_title']
                             if original_title.lower() in self.show_name_mappings:
                                 better_name = self.show_name_mappings[original_title.lower()]['name']
-                                print(f"  Using mapped show name: '{better_name}' (was: '{original_title}')")
+                                logger.info("  Using mapped show name: '%s' (was: '%s')", better_name, original_title)
                                 cleaned['show_title'] = better_name
                                 cleaned['title'] = f"{better_name} S{cleaned['season']}E{cleaned['episode']}"
                             
@@ -241,10 +487,11 @@ class SubtitleFinder:
                                 failed += 1
                         else:
                             failed += 1
+        current_file.set(("-", ""))
         
         # After processing all files, look up any shows that need better names
         if self.shows_to_lookup:
-            print("\nLooking up official names for TV shows...")
+            logger.info("Looking up official names for TV shows...")
             for show_title in self.shows_to_lookup:
                 # Skip if we already have this mapping
                 if show_title.lower() in self.show_name_mappings:
@@ -254,19 +501,19 @@ class SubtitleFinder:
                 show_info = self.get_official_show_name(show_title)
                 if show_info:
                     self.show_name_mappings[show_title.lower()] = show_info
-                    print(f"Added mapping: '{show_title}' → '{show_info['name']}'")
+                    logger.info("Added mapping: '%s' → '%s'", show_title, show_info['name'])
             
             # Save updated mappings
             self.save_show_name_mappings()
         
         # Print summary
-        print("\n" + "="*50)
-        print("Subtitle Search Summary:")
-        print(f"Total video files found: {total_files}")
-        print(f"Files with existing subtitles: {has_subtitles}")
-        print(f"Subtitles downloaded: {downloaded}")
-        print(f"Files still missing subtitles: {failed}")
-        print("="*50 + "\n")
+        summary_logger.info("=" * 50)
+        summary_logger.info("Subtitle Search Summary:")
+        summary_logger.info("Total video files found: %d", total_files)
+        summary_logger.info("Files with existing subtitles: %d", has_subtitles)
+        summary_logger.info("Subtitles downloaded: %d", downloaded)
+        summary_logger.info("Files still missing subtitles: %d", failed)
+        summary_logger.info("=" * 50)
 
     def search_movie_subtitles(self, media_info, root, file, retry_count=0):
         """Search for movie subtitles on subdl.com"""
@@ -277,9 +524,9 @@ class SubtitleFinder:
         query = re.sub(r'-+', '-', query)  # Remove duplicate dashes
         query = quote(query)
         search_url = f"{self.base_url}/search/{query}"
-        print(f"Searching URL: {search_url}", flush=True)
+        logger.debug("Searching URL: %s", search_url)
         
-        print(f"Searching subtitles for: {media_info['title']}", flush=True)
+        logger.info("Searching subtitles for: %s", media_info['title'])
         
         try:
             response = self.throttled_get(search_url)
@@ -291,24 +538,24 @@ class SubtitleFinder:
             # Step 2: Find the first <a> tag after this <h3>
             if matches_h3:
                 first_a  = matches_h3.find_next("a", href=True)
-                media_url = f"{self.base_url}{first_a["href"]}" if first_a else None
+                media_url = f"{self.base_url}{first_a['href']}" if first_a else None
                 if media_url:
-                    print(f"Fetching subtitle list from: {media_url}", flush=True)
+                    logger.debug("Fetching subtitle list from: %s", media_url)
                     
                     # Check for ad redirect (indicates no subtitles available)
                     if "subdl.com/ads" in media_url:
-                        print("No subtitles found for this title (ad redirect page detected)", flush=True)
+                        logger.warning("No subtitles found for this title (ad redirect page detected)")
                         return False
                     
                     # Now get subtitles list from the media-specific page
                     return self.get_movie_subtitle_link(media_url, media_info, root, file)    
                 else:
-                    print("No media matches found", flush=True)
+                    logger.warning("No media matches found")
             else:
-                print("No media matches found", flush=True)
+                logger.warning("No media matches found")
                 return False               
         except Exception as e:
-            print(f"Error searching for {media_info['title']}: {e}", flush=True)
+            logger.error("Error searching for %s: %s", media_info['title'], e)
             return False
 
     def get_movie_subtitle_link(self, media_url, media_info, root, file):
@@ -316,17 +563,16 @@ class SubtitleFinder:
         try:
             response = self.throttled_get(media_url)
             soup = BeautifulSoup(response.text, 'html.parser')
-            zip_link = ""
                    
             title = soup.find('h3').get_text(strip=True)
             subtitle_url = f"{self.base_url}{soup.find('a')['href']}"
             
         except Exception as e:
-            print(f"Error getting subtitle list: {e}", flush=True)
+            logger.error("Error getting subtitle list: %s", e)
             return False
         
         if subtitle_url:
-            print(f"Fetching subtitle page: {subtitle_url}", flush=True)
+            logger.debug("Fetching subtitle page: %s", subtitle_url)
             try:
                 response = self.throttled_get(subtitle_url)
                 soup= BeautifulSoup(response.text, 'html.parser')
@@ -338,29 +584,92 @@ class SubtitleFinder:
                 for section in sections:
                     header = section.find("h2")
                     if header and "English" in header.text:
-                        print("Found English section")
+                        logger.debug("Found English section")
                         # Found the English section
-                        # Now find first link inside it that ends with ".zip"
-                        zip_link = section.find("a", href=True, string=None)
-                        if not zip_link:
-                            zip_link = section.find("a", href=True)
-                        while zip_link and ".zip" not in zip_link["href"]:
-                            zip_link = zip_link.find_next("a", href=True)
+                        # Now collect every ".zip" link inside it and try the best matches
+                        candidates = self.collect_candidates(section, lambda href: ".zip" in href)
                         
-                        if zip_link:
-                            print("First English subtitle download link:", zip_link["href"], flush=True)
-                            return self.download_movie_subtitle(zip_link, media_info, root, file)
+                        if candidates:
+                            logger.info("Found %d English subtitle download links", len(candidates))
+                            return self.try_candidates(candidates, self.download_movie_subtitle,
+                                                       media_info, root, file)
                         else:
-                            print("No download link found in English section.", flush=True)
+                            logger.warning("No download link found in English section.")
                         break
                     
             except Exception as e:
-                print(f"Error finding subtitle page for {media_info['title']}: {e}", flush=True)
+                logger.error("Error finding subtitle page for %s: %s", media_info['title'], e)
                 return False        
         else:
-            print("No subtitle URL found.", flush=True)
+            logger.warning("No subtitle URL found.")
             return False   
 
+    def collect_candidates(self, section, is_download):
+        """Collect download links in a language section with their release text"""
+        candidates = []
+        seen = set()
+        for a in section.find_all("a", href=True):
+            href = a['href']
+            if not is_download(href) or href in seen:
+                continue
+            seen.add(href)
+            # The release names are listed next to the link in the same item
+            parent_li = a.find_parent('li')
+            text = (parent_li or a).get_text(separator=" ", strip=True)
+            candidates.append({'href': href, 'text': text})
+        return candidates
+
+    def rank_candidates(self, candidates, media_info, tried):
+        """Score candidates against the video's release tokens, best first"""
+        release = media_info.get('release', {})
+        ranked = []
+        for candidate in candidates:
+            if candidate['href'] in tried:
+                logger.debug("Skipping already tried subtitle: %s", candidate['href'])
+                continue
+            
+            words = set(re.split(r'[^a-z0-9]+', candidate['text'].lower()))
+            score = 0
+            for kind, weight in TOKEN_WEIGHTS.items():
+                for token in release.get(kind, []):
+                    # Multi-part tags like "web-dl" must match every part
+                    parts = [part for part in re.split(r'[^a-z0-9]+', token) if part]
+                    if parts and all(part in words for part in parts):
+                        score += weight
+            if candidate.get('episode_match'):
+                score += EPISODE_MATCH_BONUS
+            ranked.append((score, candidate))
+        
+        # Stable sort keeps page order between equally scored candidates
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return ranked
+
+    def try_candidates(self, candidates, download, media_info, root, file):
+        """Download ranked candidates in turn until one yields a subtitle"""
+        file_path = os.path.join(root, file)
+        tried = self.tried_subtitles.get(file_path, [])
+        ranked = self.rank_candidates(candidates, media_info, tried)
+        
+        if not ranked:
+            logger.warning("All %d subtitle candidates were already tried", len(candidates))
+            return False
+        
+        for score, candidate in ranked[:self.max_candidates]:
+            logger.info("Trying subtitle (score %d): %s", score, candidate['text'])
+            result = download(candidate, media_info, root, file)
+            if result == DOWNLOAD_OK:
+                if self.tried_subtitles.pop(file_path, None) is not None:
+                    self.save_tried_subtitles()
+                return True
+            if result == DOWNLOAD_MISS:
+                # Saved straight away so an interrupted run keeps its misses
+                self.tried_subtitles.setdefault(file_path, []).append(candidate['href'])
+                self.save_tried_subtitles()
+        
+        logger.warning("No usable subtitle in the top %d of %d candidates",
+                       min(len(ranked), self.max_candidates), len(ranked))
+        return False
+
     def download_movie_subtitle(self, subtitle_url, media_info, output_folder, file):
         """Download and extract movie subtitle"""
         # Ensure output folder exists
@@ -372,12 +681,12 @@ class SubtitleFinder:
 
         try:
             # Download the zip file
-            print("Downloading:", subtitle_url["href"], flush=True)
+            logger.info("Downloading: %s", subtitle_url["href"])
             response = requests.get(subtitle_url["href"], stream=True)
             response.raise_for_status()  # Raise error if download fails
             with open(zip_path, "wb") as f:
                 f.write(response.content)
-            print(f"Saved subtitle zip: {zip_path}", flush=True)
+            logger.debug("Saved subtitle zip: %s", zip_path)
 
             # Extract the zip file
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
@@ -403,25 +712,26 @@ class SubtitleFinder:
                     new_file_path = os.path.join(output_folder, base_name)
                     shutil.move(original_file_path, new_file_path)
                     
-                    print(f"Successfully downloaded subtitle: {new_file_path}", flush=True)
-                    print(f"Selected largest .srt file: {largest_srt} ({max_size} bytes)", flush=True)
+                    logger.info("Successfully downloaded subtitle: %s", new_file_path)
+                    logger.info("Selected largest .srt file: %s (%d bytes)", largest_srt, max_size)
                     shutil.rmtree(temp_extract_folder)
                 else:
-                    print("No .srt files found in the zip archive", flush=True)
+                    logger.warning("No .srt files found in the zip archive")
 
             # Clean up zip file after successful extraction
             if os.path.exists(zip_path):
                 os.remove(zip_path)
-                print(f"Removed zip file: {zip_path}", flush=True)
-            return True
+                logger.debug("Removed zip file: %s", zip_path)
+            # An archive without any .srt file lets the next candidate be tried
+            return DOWNLOAD_OK if largest_srt else DOWNLOAD_MISS
         
         except Exception as e:
-            print(f"Error downloading subtitle: {e}", flush=True)
+            logger.error("Error downloading subtitle: %s", e)
             # Clean up zip file if it exists
             if os.path.exists(zip_path):
                 os.remove(zip_path)
-                print(f"Removed zip file: {zip_path}", flush=True)
-            return False
+                logger.debug("Removed zip file: %s", zip_path)
+            return DOWNLOAD_ERROR
 
 
     def search_tv_subtitles(self, media_info, root, file):
@@ -431,7 +741,7 @@ class SubtitleFinder:
         query = base_query.strip().replace(' ', '%20').lower()
         query = quote(query)
         search_url = f"{self.base_url}/search/{query}"
-        print(f"Searching TV show: {search_url}", flush=True)
+        logger.debug("Searching TV show: %s", search_url)
 
         try:
             response = self.throttled_get(search_url)
@@ -443,26 +753,26 @@ class SubtitleFinder:
                 first_a = matches_h3.find_next("a", href=True)
                 if first_a:
                     show_url = f"{self.base_url}{first_a['href']}"
-                    print(f"Found TV show page: {show_url}", flush=True)
+                    logger.debug("Found TV show page: %s", show_url)
                     
                     # Check if this is an ad redirect page
                     if "subdl.com/ads" in show_url:
-                        print("No subtitles found for this show (ad redirect page detected)", flush=True)
+                        logger.warning("No subtitles found for this show (ad redirect page detected)")
                         # Add this show to our lookup list
                         self.shows_to_lookup.add(media_info['show_title'])
-                        print(f"Added '{media_info['show_title']}' to shows that need better names")
+                        logger.info("Added '%s' to shows that need better names", media_info['show_title'])
                         return False
                     
                     return self.get_tv_season_subtitles(show_url, media_info, root, file)
             
-            print("No matching TV show found", flush=True)
+            logger.warning("No matching TV show found")
             # Add this show to our lookup list
             self.shows_to_lookup.add(media_info['show_title'])
-            print(f"Added '{media_info['show_title']}' to shows that need better names")
+            logger.info("Added '%s' to shows that need better names", media_info['show_title'])
             return False
             
         except Exception as e:
-            print(f"Error searching for TV show: {e}", flush=True)
+            logger.error("Error searching for TV show: %s", e)
             return False
 
     def get_tv_season_subtitles(self, show_url, media_info, root, file):
@@ -478,14 +788,14 @@ class SubtitleFinder:
             for a_tag in soup.find_all('a', href=True):
                 if season_str.lower() in a_tag.get_text(separator=" ", strip=True).lower():
                     episode_page = f"{self.base_url}{a_tag['href']}"
-                    print(f"Found {season_str}:", episode_page, flush=True)
+                    logger.debug("Found %s: %s", season_str, episode_page)
                     return self.get_tv_episode_subtitles(episode_page, media_info, root, file)
             
-            print(f"No subtitles found for {season_str}", flush=True)
+            logger.warning("No subtitles found for %s", season_str)
             return False
                         
         except Exception as e:
-            print(f"Error getting season subtitles: {e}", flush=True)
+            logger.error("Error getting season subtitles: %s", e)
             return False   
             
     def get_tv_episode_subtitles(self, show_url, media_info, root, file):
@@ -504,93 +814,36 @@ class SubtitleFinder:
                     break
 
             if not english_section:
-                print("English section not found.")
+                logger.warning("English section not found.")
                 return False
 
-            # Step 2: Look for episode-specific links
-            # Create multiple search patterns for the episode
-            season = media_info['season'].zfill(2)  # Ensure 2 digits (e.g., "01" instead of "1")
-            episode = media_info['episode'].zfill(2)  # Ensure 2 digits
-
-            # Different episode format patterns to search for
-            search_patterns = [
-                f"S{season}E{episode}",       # S01E01
-                f"S{season}xE{episode}",      # S01xE01
-                f"S{season}x{episode}",       # S01x01
-                f"{season}x{episode}",        # 01x01
-                f"S{season}{episode}",        # S0101
-                f"Season {season} Episode {episode}",  # Season 01 Episode 01
-                f"Season{season}Episode{episode}",     # Season01Episode01
-                f"E{episode}",                # E01 (if we're already in the right season section)
-                f"Ep{episode}",               # Ep01
-                f"Ep {episode}",              # Ep 01
-                f"Episode {episode}",         # Episode 01
-                f"Episode{episode}"           # Episode01
-            ]
-
-            episode_link = None
-            season_link = None
-
-            # Look for links containing any of our episode patterns
-            for a in english_section.find_all("a", href=True):
-                text = a.get_text().strip()
-                
-                # Check if any of our patterns match
-                if any(pattern.lower() in text.lower() for pattern in search_patterns):
+            # Step 2: Keep links for this episode and packs for this season
+            candidates = []
+            for candidate in self.collect_candidates(english_section, lambda href: href.endswith('.zip')):
+                match = self._match_tv_candidate(candidate['text'], media_info['season'],
+                                                 media_info['episode'])
+                if match == 'episode':
                     # Found a link with our episode number
-                    print(f"Found matching episode text: '{text}'")
-                    parent_li = a.find_parent('li')
-                    if parent_li:
-                        # Look for zip download link in this list item
-                        for download_a in parent_li.find_all('a', href=True):
-                            if download_a['href'].endswith('.zip'):
-                                episode_link = download_a['href']
-                                break
-                    if episode_link:
-                        break
-            
-            # If no episode-specific link, look for season links
-            if not episode_link:
-                season_number = media_info['season']
-                season_number_no_pad = str(int(season_number))  # Converts "02" to "2"
-
-                season_keywords = [
-                    f"S{season_number}",
-                    f"Season.{season_number}",
-                    f"Season {season_number}",
-                    f"Season{season_number}",
-                    f"Season.{season_number_no_pad}",
-                    f"Season {season_number_no_pad}",
-                    f"Season{season_number_no_pad}"
-                ]
-                
-                for a in english_section.find_all("a", href=True):
-                    text = a.get_text()
-                    if any(keyword in text for keyword in season_keywords):
-                        parent_li = a.find_parent('li')
-                        if parent_li:
-                            for download_a in parent_li.find_all('a', href=True):
-                                if download_a['href'].endswith('.zip'):
-                                    season_link = download_a['href']
-                                    break
-                        if season_link:
-                            break
+                    logger.debug("Found matching episode text: '%s'", candidate['text'])
+                    candidate['episode_match'] = True
+                    candidates.append(candidate)
+                elif match == 'season':
+                    logger.debug("Found season package text: '%s'", candidate['text'])
+                    candidates.append(candidate)
 
             # Result
-            if episode_link:
-                episode_link = f"{episode_link}"
-                print(f"Found episode-specific subtitle: {episode_link}", flush=True)
-                return self.download_tv_subtitle({'href': episode_link}, media_info, root, file)
-            elif season_link:
-                season_link = f"{season_link}"
-                print(f"Found full season subtitle package: {season_link}", flush=True)
-                return self.download_tv_subtitle({'href': season_link}, media_info, root, file)
+            if candidates:
+                episode_count = sum(1 for c in candidates if c.get('episode_match'))
+                logger.info("Found %d episode-specific and %d season subtitle packages",
+                            episode_count, len(candidates) - episode_count)
+                return self.try_candidates(candidates, self.download_tv_subtitle,
+                                           media_info, root, file)
             else:
-                print("No matching subtitles found for this episode", flush=True)
+                logger.warning("No matching subtitles found for this episode")
                 return False
                 
         except Exception as e:
-            print(f"Error getting season subtitles: {e}")
+            logger.error("Error getting season subtitles: %s", e)
             return False
     
 
@@ -603,16 +856,16 @@ class SubtitleFinder:
 
             # Get the download URL, ensuring it's properly formatted
             download_url = subtitle_url["href"]
-            print(f"Download URL: {download_url}", flush=True)
+            logger.debug("Download URL: %s", download_url)
 
             
             # Download the zip file
-            print(f"Downloading: {download_url}", flush=True)
+            logger.info("Downloading: %s", download_url)
             response = requests.get(download_url, stream=True)
             response.raise_for_status()
             with open(zip_path, "wb") as f:
                 f.write(response.content)
-            print(f"Saved subtitle zip: {zip_path}", flush=True)
+            logger.debug("Saved subtitle zip: %s", zip_path)
             
             # Create multiple search patterns for the episode
             season = media_info['season'].zfill(2)  # Ensure 2 digits
@@ -636,7 +889,7 @@ class SubtitleFinder:
 
             # Extract the zip file
             temp_extract_folder = tempfile.mkdtemp()
-            success = False
+            result = DOWNLOAD_MISS
             
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
 
@@ -647,7 +900,7 @@ class SubtitleFinder:
                         # Check if any pattern matches this filename
                         if any(pattern.lower() in filename.lower() for pattern in episode_patterns):
                             matching_files.append(filename)
-                            print(f"Found matching subtitle file: {filename}")
+                            logger.debug("Found matching subtitle file: %s", filename)
 
                 if matching_files:
                     # Sort by file size (largest first) if there are multiple matches
@@ -662,37 +915,43 @@ class SubtitleFinder:
                     new_path = os.path.join(output_folder, os.path.splitext(file)[0] + ".english.srt")
                     shutil.move(original_path, new_path)
                     
-                    print(f"Successfully extracted episode subtitle: {new_path}", flush=True)
-                    success = True
+                    logger.info("Successfully extracted episode subtitle: %s", new_path)
+                    result = DOWNLOAD_OK
                 else:
-                    print("No episode-specific subtitle found in package", flush=True)
+                    logger.warning("No episode-specific subtitle found in package")
             
             # Close the zipfile before trying to remove it
             # Clean up temp folder
             try:
                 shutil.rmtree(temp_extract_folder)
             except Exception as e:
-                print(f"Warning: Could not remove temp folder: {e}")
+                logger.warning("Could not remove temp folder: %s", e)
                 
             # Now try to remove the zip file
             try:
                 os.remove(zip_path)
-                print(f"Removed zip file: {zip_path}")
+                logger.debug("Removed zip file: %s", zip_path)
             except Exception as e:
-                print(f"Warning: Could not remove zip file: {e}")
+                logger.warning("Could not remove zip file: %s", e)
                 
-            return success
+            return result
                     
         except Exception as e:
-            print(f"Error downloading TV subtitle: {e}")
+            logger.error("Error downloading TV subtitle: %s", e)
             # Try to clean up even if there was an error
             try:
                 if 'temp_extract_folder' in locals() and os.path.exists(temp_extract_folder):
                     shutil.rmtree(temp_extract_folder)
             except:
                 pass
-            return False
+            return DOWNLOAD_ERROR
 
 if __name__ == "__main__":
-    finder = SubtitleFinder()
-    finder.find_missing_subtitles()
+    config = load_config()
+    # Set up logging first so errors while loading saved state are logged too
+    listener = setup_logging(config)
+    try:
+        finder = SubtitleFinder(config)
+        finder.find_missing_subtitles()
+    finally:
+        listener.stop()
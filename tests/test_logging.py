@@ -0,0 +1,77 @@
+import configparser
+import json
+import logging
+
+import pytest
+
+import subtitle_finder
+from subtitle_finder import (FileContextFilter, JsonLinesFormatter, QuietFilter,
+                             SubtitleFinder, current_file, setup_logging)
+
+
+@pytest.fixture
+def restore_loggers():
+    """Undo the global logger changes made by setup_logging()"""
+    saved = [(log, log.level, log.propagate, list(log.handlers))
+             for log in (subtitle_finder.logger, subtitle_finder.summary_logger)]
+    yield
+    for log, level, propagate, handlers in saved:
+        log.setLevel(level)
+        log.propagate = propagate
+        log.handlers[:] = handlers
+
+
+def make_record(name="subtitle_finder", level=logging.INFO, msg="Found %s", args=("a.mkv",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_json_lines_formatter_includes_correlation_fields():
+    record = make_record()
+    token = current_file.set(("abcd1234", "/media/a.mkv"))
+    try:
+        FileContextFilter().filter(record)
+    finally:
+        current_file.reset(token)
+
+    entry = json.loads(JsonLinesFormatter().format(record))
+    assert entry['file_id'] == "abcd1234"
+    assert entry['file'] == "/media/a.mkv"
+    assert entry['level'] == "INFO"
+    assert entry['msg'] == "Found a.mkv"
+
+
+def test_json_lines_formatter_without_file_context():
+    entry = json.loads(JsonLinesFormatter().format(make_record()))
+    assert entry['file_id'] == "-"
+    assert entry['file'] == ""
+
+
+def test_quiet_filter_passes_summary_and_errors_only():
+    quiet = QuietFilter()
+    assert quiet.filter(make_record(name="subtitle_finder.summary"))
+    assert quiet.filter(make_record(level=logging.ERROR))
+    assert not quiet.filter(make_record())
+    assert not quiet.filter(make_record(level=logging.WARNING))
+
+
+def test_setup_logging_falls_back_to_console_on_bad_log_file(tmp_path, capsys, restore_loggers):
+    config = configparser.ConfigParser()
+    config.read_dict({'Logging': {'log_file': str(tmp_path / "missing" / "run.log")}})
+    listener = setup_logging(config)
+    try:
+        subtitle_finder.logger.info("Scanning media folder: %s", "media")
+    finally:
+        listener.stop()
+
+    out = capsys.readouterr().out
+    assert "Could not open log file" in out
+    assert "Scanning media folder: media" in out
+
+
+def test_file_id_is_stable_per_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    finder = SubtitleFinder(configparser.ConfigParser())
+    path = str(tmp_path / "Show" / "Show.S01E05.mkv")
+    assert finder.file_id(path) == SubtitleFinder(configparser.ConfigParser()).file_id(path)
+    assert finder.file_id(path) != finder.file_id(path + ".other")
+    assert len(finder.file_id(path)) == 8
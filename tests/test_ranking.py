@@ -0,0 +1,102 @@
+import configparser
+import json
+
+import pytest
+
+from subtitle_finder import DOWNLOAD_ERROR, DOWNLOAD_MISS, DOWNLOAD_OK, SubtitleFinder
+
+
+@pytest.fixture
+def finder(tmp_path, monkeypatch):
+    # Saved state files are read from and written to the working directory
+    monkeypatch.chdir(tmp_path)
+    return SubtitleFinder(configparser.ConfigParser())
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Show.Name.S01E05.1080p.WEB-DL.x264-NTb",
+     {'group': ['ntb'], 'source': ['web-dl'], 'resolution': ['1080p'], 'other': ['x264']}),
+    ("The.Movie.2020.1080p.BluRay.x265-MeGusta",
+     {'group': ['megusta'], 'source': ['bluray'], 'resolution': ['1080p'], 'other': ['x265']}),
+    ("Show.S01E01.720p.h264-GROUP[rarbg]",
+     {'group': ['group'], 'source': [], 'resolution': ['720p'], 'other': ['h264']}),
+    ("Movie.2020.1080p.WEB-DL",
+     {'group': [], 'source': ['web-dl'], 'resolution': ['1080p'], 'other': []}),
+    ("Movie (2019) [1080p]",
+     {'group': [], 'source': [], 'resolution': ['1080p'], 'other': []}),
+    ("Ant-Man",
+     {'group': [], 'source': [], 'resolution': [], 'other': []}),
+    ("Show.Name.S01E05.Pilot-Part",
+     {'group': [], 'source': [], 'resolution': [], 'other': []}),
+])
+def test_release_tokens(finder, name, expected):
+    assert finder._release_tokens(name) == expected
+
+
+def test_clean_filename_keeps_release_tokens(finder):
+    info = finder.clean_filename("Movie.2020.720p.BluRay.x264-SPARKS.mkv")
+    assert info['release']['group'] == ['sparks']
+    assert info['release']['resolution'] == ['720p']
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Show.S01E05.720p.HDTV", 'episode'),
+    ("Show.S01xE05", 'episode'),
+    ("Show.1x05.HDTV", 'episode'),
+    ("Show Season 1 Episode 5", 'episode'),
+    ("Show.S01E04-E06.1080p", 'episode'),
+    ("Show.S01E04-06.1080p", 'episode'),
+    ("Show.E05.720p", 'episode'),
+    ("Show.E04E05.720p", 'episode'),
+    ("Show.E06.720p", None),
+    ("Show.S02E05.720p", None),
+    ("Show.S01E03 - 720p WEB", None),
+    ("Show.S01E03-720p", None),
+    ("Show.S01E01-E03", None),
+    ("Show.S01.720p.HDTV", 'season'),
+    ("Show Season 1 1080p", 'season'),
+    ("Show Season 10", None),
+    ("Show.S10.Complete", None),
+])
+def test_match_tv_candidate(finder, text, expected):
+    assert finder._match_tv_candidate(text, '01', '05') == expected
+
+
+@pytest.mark.parametrize("text", ["Show.S01E05E06.720p", "Show.S01E05E06E07"])
+def test_match_tv_candidate_chained_episodes(finder, text):
+    assert finder._match_tv_candidate(text, '01', '06') == 'episode'
+    assert finder._match_tv_candidate(text, '01', '08') is None
+
+
+def test_rank_candidates_orders_by_release_match(finder):
+    info = finder.clean_filename("Show.Name.S01E05.1080p.WEB-DL.x264-NTb.mkv")
+    candidates = [
+        {'href': 'a.zip', 'text': 'Show.Name.S01.720p.HDTV'},
+        {'href': 'b.zip', 'text': 'Show.Name.S01E05.720p.HDTV-LOL', 'episode_match': True},
+        {'href': 'c.zip', 'text': 'Show.Name.S01E05.1080p.WEB-DL.x264-NTb', 'episode_match': True},
+    ]
+    ranked = finder.rank_candidates(candidates, info, tried=['b.zip'])
+    assert [c['href'] for _, c in ranked] == ['c.zip', 'a.zip']
+    # group 3 + source 2 + resolution 2 + x264 1 + episode bonus
+    assert ranked[0][0] == 18
+    assert ranked[1][0] == 0
+
+
+def test_try_candidates_records_misses_but_not_errors(finder, tmp_path):
+    finder.max_candidates = 3
+    info = finder.clean_filename("Movie.2020.1080p.BluRay.x264-SPARKS.mkv")
+    candidates = [{'href': h, 'text': h} for h in ('err.zip', 'miss.zip', 'ok.zip')]
+    results = {'err.zip': DOWNLOAD_ERROR, 'miss.zip': DOWNLOAD_MISS, 'ok.zip': DOWNLOAD_ERROR}
+
+    def download(candidate, *_):
+        return results[candidate['href']]
+
+    assert not finder.try_candidates(candidates, download, info, 'root', 'movie.mkv')
+    saved = json.loads((tmp_path / 'tried_subtitles.json').read_text(encoding='utf-8'))
+    assert list(saved.values()) == [['miss.zip']]
+
+    # A later success forgets the file's earlier misses
+    results['ok.zip'] = DOWNLOAD_OK
+    assert finder.try_candidates(candidates, download, info, 'root', 'movie.mkv')
+    saved = json.loads((tmp_path / 'tried_subtitles.json').read_text(encoding='utf-8'))
+    assert saved == {}